@@ -48,6 +48,9 @@ class StableDiffusionModel(BaseModel):
     # autocast context
     autocast_context: torch.autocast | nullcontext
 
+    # activation offloading context
+    activation_offloading_context: torch.autograd.graph.saved_tensors_hooks | nullcontext
+
     train_dtype: DataType
 
     # persistent embedding training data
@@ -109,6 +112,7 @@ class StableDiffusionModel(BaseModel):
         self.depth_estimator = depth_estimator
 
         self.autocast_context = nullcontext()
+        self.activation_offloading_context = nullcontext()
 
         self.train_dtype = DataType.FLOAT_32
 
@@ -15,7 +15,9 @@ from modules.modelSetup.mixin.ModelSetupDiffusionLossMixin import ModelSetupDiff
 from modules.modelSetup.mixin.ModelSetupDiffusionNoiseMixin import ModelSetupDiffusionNoiseMixin
 from modules.modelSetup.stableDiffusion.checkpointing_util import \
     enable_checkpointing_for_transformer_blocks, enable_checkpointing_for_clip_encoder_layers, \
-    create_checkpointed_forward
+    create_checkpointed_forward, disable_checkpointing_for_transformer_2d_models
+from modules.modelSetup.stableDiffusion.compile_util import compile_transformer_blocks, \
+    compile_clip_encoder_layers
 from modules.module.AdditionalEmbeddingWrapper import AdditionalEmbeddingWrapper
 from modules.util.TrainProgress import TrainProgress
 from modules.util.config.TrainConfig import TrainConfig
@@ -23,6 +25,7 @@ from modules.util.conv_util import apply_circular_padding_to_conv2d
 from modules.util.dtype_util import create_autocast_context
 from modules.util.enum.AttentionMechanism import AttentionMechanism
 from modules.util.enum.TrainingMethod import TrainingMethod
+from modules.util.offloading_util import create_activation_offloading_context
 
 
 class BaseStableDiffusionSetup(
@@ -65,11 +68,43 @@ class BaseStableDiffusionSetup(
                         f" correctly and a GPU is available: {e}"
                     )
 
+        compile_text_encoder = config.compile_text_encoder \
+                               and (config.text_encoder.train or config.train_any_embedding())
+
+        if config.compile_unet or compile_text_encoder:
+            if config.aspect_ratio_bucketing or len(config.resolution.split(',')) > 1:
+                raise RuntimeError(
+                    '"compile_unet" and "compile_text_encoder" need a static batch shape.'
+                    ' Disable aspect ratio bucketing and use a single resolution'
+                )
+
+        if config.activation_offloading and (config.compile_unet or compile_text_encoder):
+            raise RuntimeError('"activation_offloading" can not be used together with compiled modules')
+
+        if config.compile_unet:
+            # the compiled convolutions pick the faster NHWC kernels. the latent inputs are converted in predict()
+            model.unet.to(memory_format=torch.channels_last)
+
+        if config.selective_compile:
+            # compile individual blocks before checkpointing is applied,
+            # a compiled top level module would skip all checkpointed blocks
+            if config.compile_unet:
+                compile_transformer_blocks(model.unet)
+            if compile_text_encoder:
+                compile_clip_encoder_layers(model.text_encoder)
+
         if config.gradient_checkpointing:
             model.vae.enable_gradient_checkpointing()
             model.unet.enable_gradient_checkpointing()
-            enable_checkpointing_for_transformer_blocks(model.unet, self.train_device)
-            enable_checkpointing_for_clip_encoder_layers(model.text_encoder, self.train_device)
+            if config.gradient_checkpointing_interval > 1 or config.selective_compile:
+                # keep the resnet checkpointing, the transformer blocks are checkpointed at the interval below
+                disable_checkpointing_for_transformer_2d_models(model.unet)
+            enable_checkpointing_for_transformer_blocks(
+                model.unet, self.train_device, config.gradient_checkpointing_interval
+            )
+            enable_checkpointing_for_clip_encoder_layers(
+                model.text_encoder, self.train_device, config.gradient_checkpointing_interval
+            )
 
         if config.force_circular_padding:
             apply_circular_padding_to_conv2d(model.vae)
@@ -77,6 +112,15 @@ class BaseStableDiffusionSetup(
             if model.unet_lora is not None:
                 apply_circular_padding_to_conv2d(model.unet_lora)
 
+        # cuda graph replay does not work with the recompute pass of checkpointing
+        compile_mode = "default" if config.gradient_checkpointing else "reduce-overhead"
+
+        if config.compile_unet and not config.selective_compile:
+            model.unet.compile(mode=compile_mode, fullgraph=False, dynamic=False)
+
+        if compile_text_encoder and not config.selective_compile:
+            model.text_encoder.compile(mode=compile_mode, fullgraph=False, dynamic=False)
+
         model.autocast_context, model.train_dtype = create_autocast_context(self.train_device, config.train_dtype, [
             config.weight_dtypes().text_encoder,
             config.weight_dtypes().unet,
@@ -85,6 +129,10 @@ class BaseStableDiffusionSetup(
             config.weight_dtypes().embedding if config.train_any_embedding() else None,
         ], config.enable_autocast_cache)
 
+        model.activation_offloading_context = create_activation_offloading_context(
+            self.train_device, config.activation_offloading
+        )
+
     def _setup_additional_embeddings(
             self,
             model: StableDiffusionModel,
@@ -188,7 +236,7 @@ class BaseStableDiffusionSetup(
             *,
             deterministic: bool = False,
     ) -> dict:
-        with model.autocast_context:
+        with model.autocast_context, model.activation_offloading_context:
             generator = torch.Generator(device=config.train_device)
             generator.manual_seed(train_progress.global_step)
             rand = Random(train_progress.global_step)
@@ -197,6 +245,16 @@ class BaseStableDiffusionSetup(
 
             vae_scaling_factor = model.vae.config['scaling_factor']
 
+            batch_size = batch['latent_image'].shape[0]
+            compiled_modules = config.compile_unet or (
+                    config.compile_text_encoder and (config.text_encoder.train or config.train_any_embedding()))
+            if compiled_modules and batch_size != config.batch_size:
+                # a different batch size would recompile the modules
+                raise RuntimeError(
+                    '"compile_unet" and "compile_text_encoder" need a static batch shape.'
+                    f' Got a batch of {batch_size} samples, expected {config.batch_size}'
+                )
+
             if config.text_encoder.train or config.train_any_embedding():
                 text_encoder_output = self.__encode_text(
                     model,
@@ -248,6 +306,9 @@ class BaseStableDiffusionSetup(
                     else:
                         latent_input = scaled_noisy_latent_image
 
+                    if config.compile_unet:
+                        latent_input = latent_input.contiguous(memory_format=torch.channels_last)
+
                     if config.model_type.has_depth_input():
                         predicted_latent_noise = checkpointed_unet(
                             latent_input,
@@ -338,6 +399,9 @@ class BaseStableDiffusionSetup(
                 else:
                     latent_input = scaled_noisy_latent_image
 
+                if config.compile_unet:
+                    latent_input = latent_input.contiguous(memory_format=torch.channels_last)
+
                 if config.model_type.has_depth_input():
                     predicted_latent_noise = model.unet(
                         latent_input, timestep, text_encoder_output, batch['latent_depth']
@@ -1,3 +1,4 @@
+import itertools
 from typing import Iterable
 
 import torch
@@ -9,6 +10,8 @@ from modules.module.LoRAModule import LoRAModuleWrapper
 from modules.util import create
 from modules.util.TrainProgress import TrainProgress
 from modules.util.config.TrainConfig import TrainConfig
+from modules.util.dtype_util import ensure_dtype
+from modules.util.quantization_util import replace_linear_with_nf4_layers
 
 
 class StableDiffusionLoRASetup(
@@ -31,18 +34,11 @@ class StableDiffusionLoRASetup(
             model: StableDiffusionModel,
             config: TrainConfig,
     ) -> Iterable[Parameter]:
-        params = list()
-
-        if config.text_encoder.train:
-            params += list(model.text_encoder_lora.parameters())
-
-        if config.train_any_embedding():
-            params += list(model.embedding_wrapper.parameters())
-
-        if config.unet.train:
-            params += list(model.unet_lora.parameters())
-
-        return params
+        return list(itertools.chain(
+            model.text_encoder_lora.parameters() if config.text_encoder.train else (),
+            model.embedding_wrapper.parameters() if config.train_any_embedding() else (),
+            model.unet_lora.parameters() if config.unet.train else (),
+        ))
 
     def create_parameters_for_optimizer(
             self,
@@ -85,10 +81,6 @@ class StableDiffusionLoRASetup(
             model: StableDiffusionModel,
             config: TrainConfig,
     ):
-        model.text_encoder.requires_grad_(False)
-        model.unet.requires_grad_(False)
-        model.vae.requires_grad_(False)
-
         if model.text_encoder_lora is not None:
             train_text_encoder = config.text_encoder.train and \
                                  not self.stop_text_encoder_training_elapsed(config, model.train_progress)
@@ -105,20 +97,42 @@ class StableDiffusionLoRASetup(
                          not self.stop_unet_training_elapsed(config, model.train_progress)
             model.unet_lora.requires_grad_(train_unet)
 
+    def __text_encoder_on_train_device(
+            self,
+            config: TrainConfig,
+    ) -> bool:
+        return config.text_encoder.train \
+            or config.train_any_embedding() \
+            or config.align_prop \
+            or not config.latent_caching
+
     def setup_model(
             self,
             model: StableDiffusionModel,
             config: TrainConfig,
     ):
+        if config.quantize_frozen_weights:
+            if self.train_device.type != 'cuda':
+                raise RuntimeError('"quantize_frozen_weights" is only supported on CUDA devices')
+
+            # the linear layers are replaced before the LoRA modules are created, so the LoRA hooks wrap the
+            # quantized layers. The text encoder is only quantized if it is never moved to the temp device.
+            replace_linear_with_nf4_layers(model.unet, config.train_dtype.torch_dtype())
+            if self.__text_encoder_on_train_device(config):
+                replace_linear_with_nf4_layers(model.text_encoder, config.train_dtype.torch_dtype())
+
         if config.train_any_embedding():
-            model.text_encoder.get_input_embeddings().to(dtype=config.embedding_weight_dtype.torch_dtype())
+            ensure_dtype(model.text_encoder.get_input_embeddings(), config.embedding_weight_dtype.torch_dtype())
 
+        # create the LoRA weights in their final dtype, instead of allocating and then casting float32 weights
         model.text_encoder_lora = LoRAModuleWrapper(
-            model.text_encoder, config.lora_rank, "lora_te", config.lora_alpha
+            model.text_encoder, config.lora_rank, "lora_te", config.lora_alpha,
+            dtype=config.lora_weight_dtype.torch_dtype(),
         )
 
         model.unet_lora = LoRAModuleWrapper(
-            model.unet, config.lora_rank, "lora_unet", config.lora_alpha, ["attentions"]
+            model.unet, config.lora_rank, "lora_unet", config.lora_alpha, ["attentions"],
+            dtype=config.lora_weight_dtype.torch_dtype(),
         )
 
         if model.lora_state_dict:
@@ -129,9 +143,6 @@ class StableDiffusionLoRASetup(
         model.text_encoder_lora.set_dropout(config.dropout_probability)
         model.unet_lora.set_dropout(config.dropout_probability)
 
-        model.text_encoder_lora.to(dtype=config.lora_weight_dtype.torch_dtype())
-        model.unet_lora.to(dtype=config.lora_weight_dtype.torch_dtype())
-
         model.text_encoder_lora.hook_to_module()
         model.unet_lora.hook_to_module()
 
@@ -142,6 +153,11 @@ class StableDiffusionLoRASetup(
         self._remove_added_embeddings_from_tokenizer(model.tokenizer)
         self._setup_additional_embeddings(model, config)
         self._setup_embedding_wrapper(model, config)
+
+        # the base weights are never trained, so they only need to be frozen once instead of after every step
+        model.text_encoder.requires_grad_(False)
+        model.unet.requires_grad_(False)
+        model.vae.requires_grad_(False)
         self.__setup_requires_grad(model, config)
 
         model.optimizer = create.create_optimizer(
@@ -162,11 +178,7 @@ class StableDiffusionLoRASetup(
             config: TrainConfig,
     ):
         vae_on_train_device = self.debug_mode or config.align_prop
-        text_encoder_on_train_device = \
-            config.text_encoder.train \
-            or config.train_any_embedding() \
-            or config.align_prop \
-            or not config.latent_caching
+        text_encoder_on_train_device = self.__text_encoder_on_train_device(config)
 
         model.text_encoder_to(self.train_device if text_encoder_on_train_device else self.temp_device)
         model.vae_to(self.train_device if vae_on_train_device else self.temp_device)
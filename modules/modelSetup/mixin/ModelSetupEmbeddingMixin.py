@@ -41,9 +41,10 @@ class ModelSetupEmbeddingMixin(metaclass=ABCMeta):
             )[0]
             initial_token_ids += [pad_token_id] * (token_count - len(initial_token_ids))
 
+            # gather all rows in one lookup, instead of indexing and stacking each token on its own
             all_embeddings = text_encoder.get_input_embeddings().weight.data
-            initial_embeddings = [all_embeddings[token_id] for token_id in initial_token_ids]
-            return torch.stack(initial_embeddings)
+            initial_token_ids = torch.tensor(initial_token_ids, dtype=torch.long, device=all_embeddings.device)
+            return all_embeddings.index_select(0, initial_token_ids)
 
     def _add_embedding_to_tokenizer(
             self,
@@ -1,6 +1,7 @@
 from typing import Callable
 
 import torch
+from diffusers import Transformer2DModel
 from diffusers.models.attention import BasicTransformerBlock
 from diffusers.models.unets.unet_stable_cascade import SDCascadeTimestepBlock, SDCascadeAttnBlock, SDCascadeResBlock
 from torch import nn
@@ -41,16 +42,24 @@ def create_checkpointed_forward(orig_module: nn.Module, device: torch.device) ->
     return forward
 
 
-def enable_checkpointing_for_transformer_blocks(orig_module: nn.Module, device: torch.device):
-    for name, child_module in orig_module.named_modules():
-        if isinstance(child_module, BasicTransformerBlock):
-            child_module.forward = create_checkpointed_forward(child_module, device)
+def enable_checkpointing_for_transformer_blocks(orig_module: nn.Module, device: torch.device, interval: int = 1):
+    blocks = [child_module for child_module in orig_module.modules() if isinstance(child_module, BasicTransformerBlock)]
+    for child_module in blocks[::max(interval, 1)]:
+        child_module.forward = create_checkpointed_forward(child_module, device)
 
 
-def enable_checkpointing_for_clip_encoder_layers(orig_module: nn.Module, device: torch.device):
-    for name, child_module in orig_module.named_modules():
-        if isinstance(child_module, CLIPEncoderLayer):
-            child_module.forward = create_checkpointed_forward(child_module, device)
+def disable_checkpointing_for_transformer_2d_models(orig_module: nn.Module):
+    # diffusers checkpoints every transformer block of a Transformer2DModel in train mode,
+    # independent of the blocks checkpointed by enable_checkpointing_for_transformer_blocks
+    for child_module in orig_module.modules():
+        if isinstance(child_module, Transformer2DModel):
+            child_module.gradient_checkpointing = False
+
+
+def enable_checkpointing_for_clip_encoder_layers(orig_module: nn.Module, device: torch.device, interval: int = 1):
+    layers = [child_module for child_module in orig_module.modules() if isinstance(child_module, CLIPEncoderLayer)]
+    for child_module in layers[::max(interval, 1)]:
+        child_module.forward = create_checkpointed_forward(child_module, device)
 
 
 def enable_checkpointing_for_stable_cascade_blocks(orig_module: nn.Module, device: torch.device):
@@ -0,0 +1,32 @@
+import torch
+from diffusers.models.attention import BasicTransformerBlock
+from torch import nn
+from transformers.models.clip.modeling_clip import CLIPEncoderLayer
+
+
+def _compile_forward(orig_module: nn.Module):
+    # compile the original forward function, so checkpointing can be applied on top of the compiled block
+    orig_module.forward = torch.compile(orig_module.forward, fullgraph=False, dynamic=False)
+
+
+def _raise_cache_size_limit(block_count: int):
+    # every compiled block is guarded on its own module instance, which counts against the cache size limit
+    torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, block_count)
+
+
+def compile_transformer_blocks(orig_module: nn.Module):
+    block_count = 0
+    for name, child_module in orig_module.named_modules():
+        if isinstance(child_module, BasicTransformerBlock):
+            _compile_forward(child_module)
+            block_count += 1
+    _raise_cache_size_limit(block_count)
+
+
+def compile_clip_encoder_layers(orig_module: nn.Module):
+    block_count = 0
+    for name, child_module in orig_module.named_modules():
+        if isinstance(child_module, CLIPEncoderLayer):
+            _compile_forward(child_module)
+            block_count += 1
+    _raise_cache_size_limit(block_count)
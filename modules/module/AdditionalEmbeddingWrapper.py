@@ -29,14 +29,31 @@ class AdditionalEmbeddingWrapper(metaclass=ABCMeta):
         self.orig_median_norm = torch.norm(self.orig_module.weight, dim=1).median().item()
 
     def forward(self, x, *args, **kwargs):
-        # ensure that the original weights only contain as many embeddings as the unmodified tokenizer can create
-        orig_module_weight = self.orig_module.weight[0:self.original_token_count]
-        weight = torch.cat([orig_module_weight] + self.additional_embeddings, dim=0)
-        return F.embedding(
-            input=x,
-            weight=weight,
+        if len(self.additional_embeddings) == 0:
+            return F.embedding(
+                input=x,
+                weight=self.orig_module.weight,
+            )
+
+        # token ids past the unmodified tokenizer vocabulary belong to the additional embeddings.
+        # look up both tables separately instead of concatenating the full vocabulary on every call,
+        # the additional tokens are replaced by id 0 for the lookup in the original weights
+        is_additional_token = x >= self.original_token_count
+
+        orig_embeddings = F.embedding(
+            input=x.masked_fill(is_additional_token, 0),
+            weight=self.orig_module.weight,
         )
 
+        # the index_select backward accumulates duplicate tokens with atomic adds into the few trained rows
+        additional_weight = torch.cat(self.additional_embeddings, dim=0)
+        additional_token_ids = (x - self.original_token_count).clamp(min=0)
+        additional_embeddings = additional_weight \
+            .index_select(0, additional_token_ids.flatten()) \
+            .view(*x.shape, additional_weight.shape[1])
+
+        return torch.where(is_additional_token.unsqueeze(-1), additional_embeddings, orig_embeddings)
+
     def parameters(self):
         return self.additional_embeddings
 
@@ -54,6 +71,6 @@ class AdditionalEmbeddingWrapper(metaclass=ABCMeta):
         with torch.no_grad():
             for additional_embedding in self.additional_embeddings:
                 if additional_embedding.requires_grad:  # only normalize if the embedding is learned
-                    copy = torch.nn.functional.normalize(additional_embedding)
-                    copy.mul_(self.orig_median_norm)
-                    additional_embedding.copy_(copy)
+                    # scale the rows in place, same as F.normalize followed by a copy, but without the temporary tensor
+                    norm = torch.norm(additional_embedding, dim=1, keepdim=True).clamp_min(1e-12)
+                    additional_embedding.mul_(self.orig_median_norm / norm)
@@ -21,6 +21,7 @@ class LoRAModule(metaclass=ABCMeta):
         self.orig_module = orig_module
         self.rank = rank
         self.alpha = torch.tensor(alpha)
+        self.scale = alpha / rank
         self.dropout = Dropout(0)
         if orig_module is not None:
             self.alpha = self.alpha.to(orig_module.weight.device)
@@ -30,11 +31,13 @@ class LoRAModule(metaclass=ABCMeta):
         self.orig_forward = self.orig_module.forward if self.orig_module is not None else None
 
     def forward(self, x, *args, **kwargs):
+        # scale is a python float, so it is not recomputed on the device for every call, and compiled graphs
+        # treat it as a constant
         if self.orig_module.training:
             ld = self.lora_up(self.dropout(self.lora_down(x)))
-            return self.orig_forward(x) + ld * (self.alpha / self.rank)
+            return self.orig_forward(x) + ld * self.scale
 
-        return self.orig_forward(x) + self.lora_up(self.lora_down(x)) * (self.alpha / self.rank)
+        return self.orig_forward(x) + self.lora_up(self.lora_down(x)) * self.scale
 
     def requires_grad_(self, requires_grad: bool):
         self.lora_down.requires_grad_(requires_grad)
@@ -57,6 +60,7 @@ class LoRAModule(metaclass=ABCMeta):
             "weight": state_dict.pop(self.prefix + ".lora_up.weight")
         }
         self.alpha = state_dict.pop(self.prefix + ".alpha")
+        self.scale = self.alpha.item() / self.rank
 
         self.lora_down.load_state_dict(down_state_dict)
         self.lora_up.load_state_dict(up_state_dict)
@@ -91,27 +95,46 @@ class LoRAModule(metaclass=ABCMeta):
 
 
 class LinearLoRAModule(LoRAModule):
-    def __init__(self, prefix: str, orig_module: Linear, rank: int, alpha: float):
+    def __init__(self, prefix: str, orig_module: Linear, rank: int, alpha: float, dtype: torch.dtype | None = None):
         super(LinearLoRAModule, self).__init__(prefix, orig_module, rank, alpha)
 
         in_features = orig_module.in_features
         out_features = orig_module.out_features
 
-        self.lora_down = Linear(in_features, rank, bias=False, device=orig_module.weight.device)
-        self.lora_up = Linear(rank, out_features, bias=False, device=orig_module.weight.device)
+        self.lora_down = Linear(in_features, rank, bias=False, device=orig_module.weight.device, dtype=dtype)
+        self.lora_up = Linear(rank, out_features, bias=False, device=orig_module.weight.device, dtype=dtype)
 
         nn.init.kaiming_uniform_(self.lora_down.weight, a=math.sqrt(5))
         nn.init.zeros_(self.lora_up.weight)
 
+    def forward(self, x, *args, **kwargs):
+        orig_output = self.orig_forward(x)
+
+        ld = self.lora_down(x)
+        if self.orig_module.training:
+            ld = self.dropout(ld)
+
+        if not torch.is_autocast_enabled() \
+                and not (orig_output.dtype == ld.dtype == self.lora_up.weight.dtype):
+            return orig_output + self.lora_up(ld) * self.scale
+
+        # fuse the up projection, the scaling and the residual add into a single matmul
+        return torch.addmm(
+            orig_output.reshape(-1, orig_output.shape[-1]),
+            ld.reshape(-1, ld.shape[-1]),
+            self.lora_up.weight.t(),
+            alpha=self.scale,
+        ).view(orig_output.shape)
+
 
 class Conv2dLoRAModule(LoRAModule):
-    def __init__(self, prefix: str, orig_module: Conv2d, rank: int, alpha: float):
+    def __init__(self, prefix: str, orig_module: Conv2d, rank: int, alpha: float, dtype: torch.dtype | None = None):
         super(Conv2dLoRAModule, self).__init__(prefix, orig_module, rank, alpha)
         in_channels = orig_module.in_channels
         out_channels = orig_module.out_channels
 
-        self.lora_down = Conv2d(in_channels, rank, (1, 1), bias=False, device=orig_module.weight.device)
-        self.lora_up = Conv2d(rank, out_channels, (1, 1), bias=False, device=orig_module.weight.device)
+        self.lora_down = Conv2d(in_channels, rank, (1, 1), bias=False, device=orig_module.weight.device, dtype=dtype)
+        self.lora_up = Conv2d(rank, out_channels, (1, 1), bias=False, device=orig_module.weight.device, dtype=dtype)
 
         nn.init.kaiming_uniform_(self.lora_down.weight, a=math.sqrt(5))
         nn.init.zeros_(self.lora_up.weight)
@@ -165,6 +188,8 @@ class LoRAModuleWrapper:
     rank: int
 
     lora_modules: dict[str, LoRAModule]
+    lora_parameters: list[Parameter] | None
+    lora_requires_grad: bool | None
 
     def __init__(
             self,
@@ -173,6 +198,7 @@ class LoRAModuleWrapper:
             prefix: str,
             alpha: float = 1.0,
             module_filter: list[str] = None,
+            dtype: torch.dtype | None = None,
     ):
         super(LoRAModuleWrapper, self).__init__()
         self.orig_module = orig_module
@@ -180,30 +206,50 @@ class LoRAModuleWrapper:
         self.prefix = prefix
         self.module_filter = module_filter if module_filter is not None else []
 
-        self.lora_modules = self.__create_modules(orig_module, alpha)
+        self.lora_modules = self.__create_modules(orig_module, alpha, dtype)
+        self.lora_parameters = None
+        self.lora_requires_grad = None
 
-    def __create_modules(self, orig_module: nn.Module | None, alpha: float) -> dict[str, LoRAModule]:
+    def __create_modules(
+            self,
+            orig_module: nn.Module | None,
+            alpha: float,
+            dtype: torch.dtype | None,
+    ) -> dict[str, LoRAModule]:
         lora_modules = {}
 
         if orig_module is not None:
             for name, child_module in orig_module.named_modules():
                 if len(self.module_filter) == 0 or any([x in name for x in self.module_filter]):
                     if isinstance(child_module, Linear):
-                        lora_modules[name] = LinearLoRAModule(self.prefix + "_" + name, child_module, self.rank, alpha)
+                        lora_modules[name] = LinearLoRAModule(
+                            self.prefix + "_" + name, child_module, self.rank, alpha, dtype
+                        )
                     elif isinstance(child_module, Conv2d):
-                        lora_modules[name] = Conv2dLoRAModule(self.prefix + "_" + name, child_module, self.rank, alpha)
+                        lora_modules[name] = Conv2dLoRAModule(
+                            self.prefix + "_" + name, child_module, self.rank, alpha, dtype
+                        )
 
         return lora_modules
 
     def requires_grad_(self, requires_grad: bool):
+        # this is called after every optimizer step, but the value only changes when training of a part stops
+        if self.lora_requires_grad == requires_grad:
+            return
+
         for name, module in self.lora_modules.items():
             module.requires_grad_(requires_grad)
+        self.lora_requires_grad = requires_grad
 
     def parameters(self) -> list[Parameter]:
-        parameters = []
-        for name, module in self.lora_modules.items():
-            parameters += module.parameters()
-        return parameters
+        # the parameter objects stay the same across load_state_dict() and to() calls, so they only need to be
+        # collected once. The cache is reset whenever the module list changes.
+        if self.lora_parameters is None:
+            parameters = []
+            for name, module in self.lora_modules.items():
+                parameters += module.parameters()
+            self.lora_parameters = parameters
+        return list(self.lora_parameters)
 
     def to(self, device: torch.device = None, dtype: torch.dtype = None) -> 'LoRAModuleWrapper':
         for name, module in self.lora_modules.items():
@@ -233,6 +279,9 @@ class LoRAModuleWrapper:
                 module.load_state_dict(state_dict)
                 self.lora_modules[prefix] = module
 
+        self.lora_parameters = None
+        self.lora_requires_grad = None
+
     def state_dict(self) -> dict:
         """
         Returns the state dict
@@ -287,6 +336,8 @@ class LoRAModuleWrapper:
         Removes all dummy modules
         """
         self.lora_modules = {k: v for (k, v) in self.lora_modules.items() if not isinstance(v, DummyLoRAModule)}
+        self.lora_parameters = None
+        self.lora_requires_grad = None
 
     def set_dropout(self, dropout_probability: float):
         """
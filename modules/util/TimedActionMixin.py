@@ -8,6 +8,7 @@ class TimedActionMixin:
     def __init__(self):
         super(TimedActionMixin, self).__init__()
         self.__previous_action = {}
+        self.__elapsed_actions = set()
         self.__start_time = time.time()
 
     def repeating_action_needed(
@@ -81,23 +82,32 @@ class TimedActionMixin:
         if name not in self.__previous_action:
             self.__previous_action[name] = time.time()
 
+        # the train progress and the time only increase, so an elapsed action stays elapsed.
+        # this is checked after every optimizer step, so the result is remembered instead of recomputed
+        if name in self.__elapsed_actions:
+            return True
+
         match unit:
             case TimeUnit.EPOCH:
-                return (train_progress.epoch + 1) > int(delay)
+                elapsed = (train_progress.epoch + 1) > int(delay)
             case TimeUnit.STEP:
-                return (train_progress.global_step + 1) > int(delay)
+                elapsed = (train_progress.global_step + 1) > int(delay)
             case TimeUnit.SECOND:
                 seconds_since_start = time.time() - self.__start_time
-                return seconds_since_start > delay
+                elapsed = seconds_since_start > delay
             case TimeUnit.MINUTE:
                 seconds_since_start = time.time() - self.__start_time
-                return seconds_since_start > (delay * 60)
+                elapsed = seconds_since_start > (delay * 60)
             case TimeUnit.HOUR:
                 seconds_since_start = time.time() - self.__start_time
-                return seconds_since_start > (delay * 60 * 60)
+                elapsed = seconds_since_start > (delay * 60 * 60)
             case TimeUnit.NEVER:
-                return False
+                elapsed = False
             case TimeUnit.ALWAYS:
-                return True
+                elapsed = True
             case _:
-                return False
+                elapsed = False
+
+        if elapsed:
+            self.__elapsed_actions.add(name)
+        return elapsed
@@ -6,10 +6,12 @@ class TrainProgress:
             epoch_sample: int = 0,
             global_step: int = 0,
     ):
-        self.epoch = epoch
-        self.epoch_step = epoch_step
-        self.epoch_sample = epoch_sample
-        self.global_step = global_step
+        # the counters are compared in every step, keep them as python ints so a tensor passed in here can never
+        # cause a device sync on each comparison
+        self.epoch = int(epoch)
+        self.epoch_step = int(epoch_step)
+        self.epoch_sample = int(epoch_sample)
+        self.global_step = int(global_step)
 
     def next_step(self, batch_size: int):
         self.epoch_step += 1
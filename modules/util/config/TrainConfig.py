@@ -103,7 +103,7 @@ class TrainOptimizerConfig(BaseConfig):
         data.append(("eps2", None, float, True))
         data.append(("foreach", False, bool, True))  # Disabled, because it uses too much VRAM
         data.append(("fsdp_in_use", False, bool, False))
-        data.append(("fused", False, bool, False))
+        data.append(("fused", None, bool, True))  # None enables it if all parameters support it
         data.append(("fused_back_pass", False, bool, False))
         data.append(("growth_rate", None, float, True))
         data.append(("initial_accumulator_value", None, int, True))
@@ -205,7 +205,13 @@ class TrainConfig(BaseConfig):
     output_model_format: ModelFormat
     output_model_destination: str
     gradient_checkpointing: bool
+    gradient_checkpointing_interval: int
+    activation_offloading: bool
+    quantize_frozen_weights: bool
     force_circular_padding: bool
+    compile_unet: bool
+    compile_text_encoder: bool
+    selective_compile: bool
 
     # data settings
     concept_file_name: str
@@ -556,7 +562,13 @@ class TrainConfig(BaseConfig):
         data.append(("output_model_format", ModelFormat.SAFETENSORS, ModelFormat, False))
         data.append(("output_model_destination", "models/model.safetensors", str, False))
         data.append(("gradient_checkpointing", True, bool, False))
+        data.append(("gradient_checkpointing_interval", 1, int, False))
+        data.append(("activation_offloading", False, bool, False))
+        data.append(("quantize_frozen_weights", False, bool, False))
         data.append(("force_circular_padding", False, bool, False))
+        data.append(("compile_unet", False, bool, False))
+        data.append(("compile_text_encoder", False, bool, False))
+        data.append(("selective_compile", False, bool, False))
 
         # data settings
         data.append(("concept_file_name", "training_concepts/concepts.json", str, False))
@@ -1,3 +1,4 @@
+import itertools
 from typing import Iterable
 
 import torch
@@ -60,7 +61,7 @@ from modules.modelSetup.WuerstchenFineTuneSetup import WuerstchenFineTuneSetup
 from modules.modelSetup.WuerstchenLoRASetup import WuerstchenLoRASetup
 from modules.module.EMAModule import EMAModuleWrapper
 from modules.util.TrainProgress import TrainProgress
-from modules.util.config.TrainConfig import TrainConfig
+from modules.util.config.TrainConfig import TrainConfig, TrainOptimizerConfig
 from modules.util.enum.EMAMode import EMAMode
 from modules.util.enum.LearningRateScheduler import LearningRateScheduler
 from modules.util.enum.ModelType import ModelType
@@ -270,6 +271,34 @@ def create_data_loader(
                 return PixArtAlphaBaseDataLoader(train_device, temp_device, config, model, train_progress)
 
 
+def _has_bf16_parameters(optimizer: torch.optim.Optimizer) -> bool:
+    return any(
+        parameter.dtype == torch.bfloat16
+        for param_group in optimizer.param_groups
+        for parameter in param_group['params']
+    )
+
+
+def _fused_by_default(
+        parameters: list[Parameter] | list[dict],
+        optimizer_config: TrainOptimizerConfig,
+) -> bool:
+    # the fused kernel updates many small tensors, like LoRA weights, in a few launches.
+    # it is only used if torch supports it for all parameters, and no other setting excludes it
+    if optimizer_config.foreach or optimizer_config.differentiable:
+        return False
+
+    parameters = list(itertools.chain.from_iterable(
+        param_group['params'] if isinstance(param_group, dict) else [param_group] for param_group in parameters
+    ))
+
+    if optimizer_config.stochastic_rounding and any(parameter.dtype == torch.bfloat16 for parameter in parameters):
+        return False
+
+    return len(parameters) > 0 \
+        and all(parameter.is_cuda and torch.is_floating_point(parameter) for parameter in parameters)
+
+
 def create_optimizer(
         parameters: Iterable[Parameter] | list[dict],
         state_dict: dict | None,
@@ -308,9 +337,7 @@ def create_optimizer(
 
         # ADAM Optimizer
         case Optimizer.ADAM:
-            if optimizer_config.stochastic_rounding and (optimizer_config.fused or optimizer_config.foreach):
-                raise RuntimeError('"stochastic_rounding" is only allowed when "fused" and "foreach" are disabled')
-
+            parameters = list(parameters)
             optimizer = torch.optim.Adam(
                 params=parameters,
                 lr=config.learning_rate,
@@ -323,18 +350,21 @@ def create_optimizer(
                 maximize=optimizer_config.maximize if optimizer_config.maximize is not None else False,
                 capturable=optimizer_config.capturable if optimizer_config.capturable is not None else False,
                 differentiable=optimizer_config.differentiable if optimizer_config.differentiable is not None else False,
-                fused=optimizer_config.fused if optimizer_config.fused is not None else False,
+                fused=optimizer_config.fused if optimizer_config.fused is not None
+                else _fused_by_default(parameters, optimizer_config),
             )
 
-            if optimizer_config.stochastic_rounding:
-                # TODO: only patch if fused/foreach is disabled
+            # stochastic rounding only changes bf16 updates. Without bf16 parameters the patched step is not needed,
+            # so the setting can be combined with fused or foreach param groups
+            if optimizer_config.stochastic_rounding and _has_bf16_parameters(optimizer):
+                if optimizer_config.fused or optimizer_config.foreach:
+                    raise RuntimeError('"stochastic_rounding" is only allowed when "fused" and "foreach" are disabled')
+
                 patch_adam(optimizer, optimizer_config.stochastic_rounding)
 
         # ADAMW Optimizer
         case Optimizer.ADAMW:
-            if optimizer_config.stochastic_rounding and (optimizer_config.fused or optimizer_config.foreach):
-                raise RuntimeError('"stochastic_rounding" is only allowed when "fused" and "foreach" are disabled')
-
+            parameters = list(parameters)
             optimizer = torch.optim.AdamW(
                 params=parameters,
                 lr=config.learning_rate,
@@ -347,11 +377,16 @@ def create_optimizer(
                 maximize=optimizer_config.maximize if optimizer_config.maximize is not None else False,
                 capturable=optimizer_config.capturable if optimizer_config.capturable is not None else False,
                 differentiable=optimizer_config.differentiable if optimizer_config.differentiable is not None else False,
-                fused=optimizer_config.fused if optimizer_config.fused is not None else False,
+                fused=optimizer_config.fused if optimizer_config.fused is not None
+                else _fused_by_default(parameters, optimizer_config),
             )
 
-            if optimizer_config.stochastic_rounding:
-                # TODO: only patch if fused/foreach is disabled
+            # stochastic rounding only changes bf16 updates. Without bf16 parameters the patched step is not needed,
+            # so the setting can be combined with fused or foreach param groups
+            if optimizer_config.stochastic_rounding and _has_bf16_parameters(optimizer):
+                if optimizer_config.fused or optimizer_config.foreach:
+                    raise RuntimeError('"stochastic_rounding" is only allowed when "fused" and "foreach" are disabled')
+
                 patch_adamw(optimizer, optimizer_config.stochastic_rounding)
 
         # ADAM_8BIT Optimizer
@@ -672,6 +707,9 @@ def create_optimizer(
         for i, params in enumerate(parameters):
             state_dict['param_groups'][i]['lr'] = params['lr']
             state_dict['param_groups'][i]['initial_lr'] = params['initial_lr']
+            if 'fused' in optimizer.defaults:
+                # use the current setting instead of the one saved in the backup
+                state_dict['param_groups'][i]['fused'] = optimizer.defaults['fused']
 
         # TODO: this will break if the optimizer class changed during a restart
         optimizer.load_state_dict(state_dict)
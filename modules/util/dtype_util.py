@@ -1,6 +1,8 @@
 from contextlib import nullcontext
+from typing import Any
 
 import torch
+from torch import nn
 from torch.nn import Parameter
 
 from modules.util.config.TrainConfig import TrainConfig
@@ -20,6 +22,18 @@ def enable_grad_scaling(train_dtype: DataType, parameters: list[Parameter]):
     return train_dtype == DataType.FLOAT_16 and all(dtype == torch.float32 for dtype in trainable_parameter_dtype)
 
 
+def ensure_dtype(module: nn.Module | Any, dtype: torch.dtype | None):
+    """
+    Casts the module to dtype, skipping the walk over all parameters if it already has that dtype
+    """
+    if dtype is None:
+        return
+
+    parameter = next(iter(module.parameters()), None)
+    if parameter is not None and parameter.dtype != dtype:
+        module.to(dtype=dtype)
+
+
 def create_grad_scaler():
     from modules.util.CustomGradScaler import CustomGradScaler
     return CustomGradScaler()
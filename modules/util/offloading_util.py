@@ -0,0 +1,74 @@
+from contextlib import nullcontext
+
+import torch
+from torch import Tensor
+from torch.nn import Parameter
+
+
+def create_activation_offloading_context(
+        device: torch.device,
+        enabled: bool,
+        min_offload_size: int = 1024 * 1024,
+) -> torch.autograd.graph.saved_tensors_hooks | nullcontext:
+    """
+    Creates a context that moves tensors saved for the backward pass to pinned cpu memory.
+    The copies are done on a separate stream, so they can overlap with the forward pass.
+
+    Args:
+        device: the train device
+        enabled: whether offloading should be enabled
+        min_offload_size: tensors smaller than this number of bytes are kept on the device
+    """
+    if not enabled or device.type != 'cuda':
+        return nullcontext()
+
+    offload_stream = torch.cuda.Stream(device)
+
+    # the most recently saved tensor is only offloaded when the next one is saved. The last tensor of the forward
+    # pass is the first one needed in the backward pass, so it stays on the device.
+    pending_offload = []
+
+    def offload(packed: list):
+        tensor = packed[0]
+
+        # the tensor has to be fully computed before it can be copied
+        offload_stream.wait_stream(torch.cuda.current_stream(device))
+        with torch.cuda.stream(offload_stream):
+            cpu_tensor = torch.empty_like(tensor, device='cpu', pin_memory=True)
+            cpu_tensor.copy_(tensor, non_blocking=True)
+
+        # prevent the allocator from reusing the memory before the copy is done
+        tensor.record_stream(offload_stream)
+
+        packed[0] = cpu_tensor
+
+    def pack(tensor: Tensor):
+        # matmuls save the transposed weight, which is a view of the parameter and not a parameter itself
+        if not tensor.is_cuda \
+                or isinstance(tensor, Parameter) \
+                or isinstance(tensor._base, Parameter) \
+                or tensor.numel() * tensor.element_size() < min_offload_size:
+            return tensor
+
+        if pending_offload:
+            offload(pending_offload.pop())
+
+        packed = [tensor, tensor.device]
+        pending_offload.append(packed)
+        return packed
+
+    def unpack(packed: Tensor | list):
+        if isinstance(packed, Tensor):
+            return packed
+
+        # the backward pass has started, nothing is offloaded until the next forward pass
+        pending_offload.clear()
+
+        tensor, tensor_device = packed
+        if tensor.is_cuda:
+            return tensor
+
+        torch.cuda.current_stream(device).wait_stream(offload_stream)
+        return tensor.to(device=tensor_device, non_blocking=True)
+
+    return torch.autograd.graph.saved_tensors_hooks(pack, unpack)
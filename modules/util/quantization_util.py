@@ -0,0 +1,52 @@
+import torch
+from torch import nn
+
+
+def replace_linear_with_nf4_layers(
+        parent_module: nn.Module,
+        compute_dtype: torch.dtype,
+):
+    """
+    Replaces all linear layers of a frozen module with bitsandbytes nf4 layers.
+    The weights are quantized on the next move to a CUDA device.
+
+    Args:
+        parent_module: the module to quantize
+        compute_dtype: the dtype used for the dequantized matmul
+    """
+    import bitsandbytes as bnb
+
+    class LinearNf4(bnb.nn.Linear4bit):
+        def forward(self, x, *args, **kwargs):
+            # diffusers passes the lora scale as an additional argument to its linear layers
+            return super().forward(x)
+
+    def replace(module: nn.Module):
+        for name, child_module in module.named_children():
+            if isinstance(child_module, bnb.nn.Linear4bit):
+                continue
+            elif isinstance(child_module, nn.Linear):
+                quantized_module = LinearNf4(
+                    child_module.in_features,
+                    child_module.out_features,
+                    bias=False,
+                    compute_dtype=compute_dtype,
+                    compress_statistics=True,
+                    quant_type='nf4',
+                    device='meta',
+                )
+                # blocks of 64 weights share one fp32 absmax scale. compress_statistics quantizes these scales
+                # again to 8 bit, with an fp32 second level state per 256 blocks
+                quantized_module.weight = bnb.nn.Params4bit(
+                    child_module.weight.data,
+                    requires_grad=False,
+                    compress_statistics=True,
+                    quant_type='nf4',
+                    module=quantized_module,
+                )
+                quantized_module.bias = child_module.bias
+                setattr(module, name, quantized_module)
+            else:
+                replace(child_module)
+
+    replace(parent_module)